@@ -8,232 +8,511 @@ import os
 import logging
 import re
 import json
+import hashlib
+from contextlib import asynccontextmanager
 from datetime import datetime, timezone
-from playwright.async_api import async_playwright
+from pathlib import Path
+from urllib.parse import urlparse
+import aiohttp
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+from tenacity import retry, retry_if_exception, stop_after_attempt, wait_exponential
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Trim Chromium helper processes and background work the bot never uses
+CHROMIUM_ARGS = [
+    '--no-zygote',
+    '--disable-gpu',
+    '--disable-dev-shm-usage',
+    '--disable-accelerated-2d-canvas',
+    '--no-first-run',
+    '--disable-background-networking',
+    '--disable-extensions',
+    '--mute-audio'
+]
+
+# Where run-to-run state lives; set SUBSTACK_BOT_STATE_DIR to a persisted directory on ephemeral runners
+STATE_DIR = Path(os.getenv('SUBSTACK_BOT_STATE_DIR') or '~').expanduser()
+
+# Authenticated Substack session saved after a successful post, reused to skip cookie login
+STATE_PATH = STATE_DIR / '.substack_bot_state.json'
+
+# Hash of the last posted OHLC values, used to skip posting when nothing changed
+LAST_POST_PATH = STATE_DIR / '.substack_bot_lastpost'
+
+# Numeric value in legend/price text, compiled once for the scrape loops
+_NUM_RE = re.compile(r'([0-9]+[.,]?[0-9]*)')
+
+# Multiple selectors to try for OHLC values, in priority order
+OHLC_SELECTORS = {
+    'open': [
+        '[data-name="legend-source-item"] [data-name="open"]',
+        '.js-symbol-legend-open',
+        '.legend .legend-source-open'
+    ],
+    'high': [
+        '[data-name="legend-source-item"] [data-name="high"]',
+        '.js-symbol-legend-high',
+        '.legend .legend-source-high'
+    ],
+    'low': [
+        '[data-name="legend-source-item"] [data-name="low"]',
+        '.js-symbol-legend-low',
+        '.legend .legend-source-low'
+    ],
+    'close': [
+        '[data-name="legend-source-item"] [data-name="close"]',
+        '.js-symbol-last',
+        '.js-symbol-legend-close',
+        '.legend .legend-source-close'
+    ]
+}
+
+# Resolve every OHLC field in one page.evaluate round-trip; the first listed selector with a number wins
+EXTRACT_OHLC_JS = """
+([selectors, pattern]) => {
+    const numRe = new RegExp(pattern);
+    const out = {};
+    for (const [field, fieldSelectors] of Object.entries(selectors)) {
+        for (const selector of fieldSelectors) {
+            for (const el of document.querySelectorAll(selector)) {
+                const m = (el.textContent || '').match(numRe);
+                if (m) {
+                    const value = parseFloat(m[1].replace(',', ''));
+                    if (!Number.isNaN(value)) {
+                        out[field] = value;
+                        break;
+                    }
+                }
+            }
+            if (field in out) break;
+        }
+    }
+    return out;
+}
+"""
+
+# Legend is ready once the extraction script finds all four fields
+LEGEND_READY_JS = f"args => Object.keys(({EXTRACT_OHLC_JS})(args)).length === {len(OHLC_SELECTORS)}"
+
+# Resources the OHLC legend doesn't need; aborting them cuts most of the page weight
+BLOCKED_RESOURCE_TYPES = {'image', 'stylesheet', 'font', 'media'}
+BLOCKED_HOSTS = ('doubleclick.net', 'google-analytics.com', 'segment.io', 'segment.com')
+
+# TradingView screener endpoint serving the same OHLC the chart legend shows
+SCANNER_URL = 'https://scanner.tradingview.com/futures/scan'
+SCANNER_EXCHANGE = 'CME_MINI'
+SCANNER_COLUMNS = ['open', 'high', 'low', 'close']
+SCANNER_CONCURRENCY = 16
+
+def is_retryable_http_error(exc):
+    """
+    Retry connection failures, timeouts, rate limiting and server errors, but not other 4xx responses
+    """
+    if isinstance(exc, aiohttp.ClientResponseError):
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (aiohttp.ClientError, asyncio.TimeoutError))
+
+async def block_heavy_resources(route):
+    """
+    Route handler that aborts images, CSS, fonts, media and tracker requests
+    """
+    request = route.request
+    hostname = urlparse(request.url).hostname or ''
+    blocked_host = any(hostname == host or hostname.endswith('.' + host) for host in BLOCKED_HOSTS)
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or blocked_host:
+        await route.abort()
+    else:
+        await route.continue_()
+
 class SubstackBot:
     def __init__(self):
         self.substack_cookie = os.getenv('SUBSTACK_COOKIE')
         
         if not self.substack_cookie:
             raise ValueError("SUBSTACK_COOKIE environment variable must be set")
+        
+        self._pw = None
+        self._browser = None
+        self._browser_lock = asyncio.Lock()
+        self._scrape_lock = asyncio.Lock()
+        self._http = None
+        self._sem = asyncio.Semaphore(SCANNER_CONCURRENCY)
+    
+    async def __aenter__(self):
+        """
+        Open the shared HTTP session used for every scanner request
+        """
+        self._get_http()
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        """
+        Release everything the bot opened, same as the end of a run
+        """
+        await self.aclose()
+    
+    async def aclose(self):
+        """
+        Close the shared browser, Playwright driver and HTTP session
+        Callers only ever close their own contexts; shared resources are closed here and nowhere else
+        """
+        if self._browser:
+            await self._browser.close()
+            self._browser = None
+        if self._pw:
+            await self._pw.stop()
+            self._pw = None
+        if self._http:
+            await self._http.close()
+            self._http = None
+    
+    @asynccontextmanager
+    async def _lifecycle(self):
+        """
+        Own the shared browser and HTTP session for the whole run and tear them down on exit
+        """
+        try:
+            yield
+        finally:
+            await self.aclose()
+    
+    def _get_http(self):
+        """
+        Return the shared HTTP session, opening it on first use so the bot works without async with
+        """
+        if not self._http:
+            connector = aiohttp.TCPConnector(limit=64, limit_per_host=16, ttl_dns_cache=300)
+            self._http = aiohttp.ClientSession(connector=connector, timeout=aiohttp.ClientTimeout(total=10))
+        return self._http
+    
+    async def _get_browser(self):
+        """
+        Launch the shared Chromium instance on first use so HTTP-only runs never start it
+        """
+        async with self._browser_lock:
+            if not self._browser:
+                if not self._pw:
+                    self._pw = await async_playwright().start()
+                self._browser = await self._pw.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+        return self._browser
+    
+    @retry(
+        retry=retry_if_exception(is_retryable_http_error),
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=0.5, max=4),
+        reraise=True
+    )
+    async def fetch_ohlc_data(self, symbol):
+        """
+        Fetch OHLC data for a symbol from the TradingView scanner API
+        """
+        payload = {
+            'symbols': {'tickers': [f"{SCANNER_EXCHANGE}:{symbol}"]},
+            'columns': SCANNER_COLUMNS
+        }
+        async with self._sem:
+            async with self._get_http().post(SCANNER_URL, json=payload) as resp:
+                resp.raise_for_status()
+                result = await resp.json(content_type=None)
+        
+        rows = result.get('data') or []
+        if not rows:
+            raise ValueError(f"No scanner data returned for {symbol}")
+        
+        ohlc_data = dict(zip(SCANNER_COLUMNS, rows[0]['d']))
+        if not ohlc_data.get('close'):
+            raise ValueError(f"Scanner returned no close price for {symbol}")
+        
+        ohlc_data['symbol'] = symbol
+        ohlc_data['timestamp'] = datetime.now(timezone.utc).isoformat()
+        logger.info(f"Fetched {symbol} OHLC from scanner: {ohlc_data}")
+        return ohlc_data
     
     async def extract_ohlc_data(self, symbol):
         """
-        Extract OHLC (Open, High, Low, Close) data from TradingView for ES or NQ
+        Extract OHLC (Open, High, Low, Close) data for ES or NQ
+        Uses the TradingView scanner API and only falls back to scraping the chart on failure
+        Scanner requests run concurrently; chart scrapes take turns on the shared browser
+        """
+        try:
+            return await self.fetch_ohlc_data(symbol)
+        except Exception as e:
+            logger.warning(f"Scanner fetch for {symbol} failed, falling back to chart scrape: {e}")
+        
+        async with self._scrape_lock:
+            browser = await self._get_browser()
+            return await self.scrape_ohlc_data(symbol, browser)
+    
+    async def _first_numeric(self, page, selectors_csv):
+        """
+        Return the first numeric value found in elements matching a comma-joined selector list
         """
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
-            page = await browser.new_page()
+        for element in await page.query_selector_all(selectors_csv):
+            numeric_match = _NUM_RE.search(await element.text_content() or '')
+            if numeric_match:
+                # _NUM_RE only matches digits with one separator, so float() cannot fail here
+                return float(numeric_match.group(1).replace(',', ''))
+        return None
+    
+    async def scrape_ohlc_data(self, symbol, browser):
+        """
+        Scrape OHLC data from the TradingView chart legend
+        Uses an isolated context on the shared browser so symbols don't share cookies
+        """
+        context = await browser.new_context()
+        
+        try:
+            await context.route("**/*", block_heavy_resources)
+            page = await context.new_page()
+            
+            # Navigate to TradingView chart
+            url = f"https://www.tradingview.com/chart/?symbol={symbol}"
+            await page.goto(url, wait_until='domcontentloaded', timeout=15000)
             
+            # Wait until every OHLC field has a number; the legend renders before its values fill in
             try:
-                # Navigate to TradingView chart
-                url = f"https://www.tradingview.com/chart/?symbol={symbol}"
-                await page.goto(url, wait_until='networkidle')
-                
-                # Wait for chart to load
-                await page.wait_for_timeout(8000)
-                
-                # Try to find OHLC data in the legend
-                ohlc_data = {
-                    'symbol': symbol,
-                    'open': None,
-                    'high': None,
-                    'low': None,
-                    'close': None,
-                    'timestamp': datetime.now(timezone.utc).isoformat()
-                }
-                
-                # Multiple selectors to try for OHLC values
-                selectors = {
-                    'open': [
-                        '[data-name="legend-source-item"] [data-name="open"]',
-                        '.legend-item .legend-source-item .legend-source-title:contains("O")',
-                        '.js-symbol-legend-open',
-                        '.legend .legend-source-open'
-                    ],
-                    'high': [
-                        '[data-name="legend-source-item"] [data-name="high"]',
-                        '.legend-item .legend-source-item .legend-source-title:contains("H")',
-                        '.js-symbol-legend-high',
-                        '.legend .legend-source-high'
-                    ],
-                    'low': [
-                        '[data-name="legend-source-item"] [data-name="low"]',
-                        '.legend-item .legend-source-item .legend-source-title:contains("L")',
-                        '.js-symbol-legend-low', 
-                        '.legend .legend-source-low'
-                    ],
-                    'close': [
-                        '[data-name="legend-source-item"] [data-name="close"]',
-                        '.js-symbol-last',
-                        '.legend-item .legend-source-item .legend-source-title:contains("C")',
-                        '.js-symbol-legend-close',
-                        '.legend .legend-source-close'
-                    ]
-                }
-                
-                # Extract OHLC values
-                for field, field_selectors in selectors.items():
-                    for selector in field_selectors:
-                        try:
-                            elements = await page.query_selector_all(selector)
-                            for element in elements:
-                                text = await element.inner_text()
-                                # Extract numeric value
-                                numeric_match = re.search(r'([0-9]+[.,]?[0-9]*)', text)
-                                if numeric_match:
-                                    value = numeric_match.group(1).replace(',', '')
-                                    try:
-                                        ohlc_data[field] = float(value)
-                                        logger.info(f"Found {field}: {ohlc_data[field]}")
-                                        break
-                                    except ValueError:
-                                        continue
-                            if ohlc_data[field]:
-                                break
-                        except Exception as e:
-                            logger.debug(f"Selector {selector} failed: {e}")
-                            continue
-                
-                # Alternative: Try to extract from page content or API calls
-                if not any([ohlc_data['open'], ohlc_data['high'], ohlc_data['low'], ohlc_data['close']]):
-                    logger.warning("Primary selectors failed, trying alternative methods")
-                    
-                    # Look for price data in script tags or data attributes
-                    try:
-                        # Wait for any price display
-                        await page.wait_for_selector('[data-symbol-full], .tv-symbol-price-quote, .js-symbol-last', timeout=5000)
-                        
-                        # Try to get data from any visible price elements
-                        price_elements = await page.query_selector_all('.tv-symbol-price-quote, [data-field="last"], .js-symbol-last')
-                        for element in price_elements:
-                            text = await element.inner_text()
-                            numeric_match = re.search(r'([0-9]+[.,]?[0-9]*)', text)
-                            if numeric_match and not ohlc_data['close']:
-                                value = numeric_match.group(1).replace(',', '')
-                                try:
-                                    ohlc_data['close'] = float(value)
-                                    logger.info(f"Found close price: {ohlc_data['close']}")
-                                    break
-                                except ValueError:
-                                    continue
-                                    
-                    except Exception as e:
-                        logger.error(f"Alternative extraction failed: {e}")
+                await page.wait_for_function(
+                    LEGEND_READY_JS,
+                    arg=[OHLC_SELECTORS, _NUM_RE.pattern],
+                    timeout=10000
+                )
+            except PlaywrightTimeoutError:
+                logger.warning(f"Legend values for {symbol} did not appear, trying selectors anyway")
+            
+            # Try to find OHLC data in the legend
+            ohlc_data = {
+                'symbol': symbol,
+                'open': None,
+                'high': None,
+                'low': None,
+                'close': None,
+                'timestamp': datetime.now(timezone.utc).isoformat()
+            }
+            
+            # Extract OHLC values in a single DOM traversal
+            try:
+                found = await page.evaluate(EXTRACT_OHLC_JS, [OHLC_SELECTORS, _NUM_RE.pattern])
+                for field, value in found.items():
+                    ohlc_data[field] = value
+                    logger.info(f"Found {field}: {value}")
+            except Exception as e:
+                logger.debug(f"Legend evaluation failed: {e}")
+            
+            # Alternative: Try to extract from page content or API calls
+            if not any([ohlc_data['open'], ohlc_data['high'], ohlc_data['low'], ohlc_data['close']]):
+                logger.warning("Primary selectors failed, trying alternative methods")
                 
-                # If we have close but not other values, estimate them
-                if ohlc_data['close'] and not all([ohlc_data['open'], ohlc_data['high'], ohlc_data['low']]):
-                    logger.info("Estimating missing OHLC values based on close price")
-                    close_price = ohlc_data['close']
+                # Look for price data in script tags or data attributes
+                try:
+                    # Wait for any price display
+                    await page.wait_for_selector('[data-symbol-full], .tv-symbol-price-quote, .js-symbol-last', timeout=5000)
                     
-                    # Estimate with typical intraday ranges
-                    if symbol == 'ES1!':
-                        range_est = 15  # Typical ES daily range
-                    elif symbol == 'NQ1!':
-                        range_est = 75  # Typical NQ daily range
-                    else:
-                        range_est = close_price * 0.01  # 1% range
+                    # Try to get data from any visible price elements
+                    ohlc_data['close'] = await self._first_numeric(
+                        page, '.tv-symbol-price-quote, [data-field="last"], .js-symbol-last'
+                    )
+                    if ohlc_data['close']:
+                        logger.info(f"Found close price: {ohlc_data['close']}")
                     
-                    ohlc_data['high'] = ohlc_data['high'] or close_price + (range_est * 0.6)
-                    ohlc_data['low'] = ohlc_data['low'] or close_price - (range_est * 0.6) 
-                    ohlc_data['open'] = ohlc_data['open'] or close_price + (range_est * 0.2)
+                except Exception as e:
+                    logger.error(f"Alternative extraction failed: {e}")
+            
+            # If we have close but not other values, estimate them
+            if ohlc_data['close'] and not all([ohlc_data['open'], ohlc_data['high'], ohlc_data['low']]):
+                logger.info("Estimating missing OHLC values based on close price")
+                close_price = ohlc_data['close']
                 
-                return ohlc_data
+                # Estimate with typical intraday ranges
+                if symbol == 'ES1!':
+                    range_est = 15  # Typical ES daily range
+                elif symbol == 'NQ1!':
+                    range_est = 75  # Typical NQ daily range
+                else:
+                    range_est = close_price * 0.01  # 1% range
                 
-            except Exception as e:
-                logger.error(f"Error extracting OHLC data: {e}")
-                return None
-            finally:
-                await browser.close()
+                ohlc_data['high'] = ohlc_data['high'] or close_price + (range_est * 0.6)
+                ohlc_data['low'] = ohlc_data['low'] or close_price - (range_est * 0.6) 
+                ohlc_data['open'] = ohlc_data['open'] or close_price + (range_est * 0.2)
+            
+            return ohlc_data
+            
+        except Exception as e:
+            logger.error(f"Error extracting OHLC data: {e}")
+            return None
+        finally:
+            # Closing the whole context reclaims tab memory that page.close() alone can leave behind
+            await context.close()
     
-    async def post_to_substack_chat(self, message):
+    async def post_to_substack_chat(self, message, browser):
         """
         Post message to Substack Chat using cookie authentication
+        Reuses the saved storage state from a previous run when available
+        """
+        saved_state = self._load_state()
+        if saved_state:
+            if await self._post_in_context(message, browser, saved_state):
+                return
+            # Saved session is stale; drop it and log in with the cookie in this same run
+            logger.warning("Saved Substack session is stale, retrying with cookie login")
+            STATE_PATH.unlink(missing_ok=True)
+        
+        await self._post_in_context(message, browser, None)
+    
+    def _cookie_hash(self):
+        """
+        Fingerprint of SUBSTACK_COOKIE stored alongside the saved session, never the cookie itself
         """
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(headless=True)
+        return hashlib.sha256(self.substack_cookie.encode()).hexdigest()
+    
+    def _load_state(self):
+        """
+        Load the saved storage state, discarding it if unreadable or saved for a different SUBSTACK_COOKIE
+        """
+        if not STATE_PATH.exists():
+            return None
+        try:
+            saved = json.loads(STATE_PATH.read_text())
+            if saved.get('cookie_sha256') == self._cookie_hash():
+                return saved['storage_state']
+            logger.info("SUBSTACK_COOKIE changed since the session was saved, discarding it")
+        except Exception as e:
+            logger.warning(f"Could not read saved Substack session: {e}")
+        STATE_PATH.unlink(missing_ok=True)
+        return None
+    
+    async def _post_in_context(self, message, browser, storage_state):
+        """
+        Post message in a fresh context authenticated by saved state or cookie injection
+        Returns False when a saved session can't be loaded or never reaches the chat input, True once posted
+        """
+        use_saved_state = storage_state is not None
+        if use_saved_state:
+            try:
+                context = await browser.new_context(storage_state=storage_state)
+            except Exception as e:
+                logger.warning(f"Could not load saved Substack session: {e}")
+                return False
+        else:
             context = await browser.new_context()
-            
-            # Set the Substack cookie
-            await context.add_cookies([{
-                'name': 'substack.sid',
-                'value': self.substack_cookie,
-                'domain': '.substack.com',
-                'path': '/'
-            }])
+        
+        try:
+            if not use_saved_state:
+                # Set the Substack cookie
+                await context.add_cookies([{
+                    'name': 'substack.sid',
+                    'value': self.substack_cookie,
+                    'domain': '.substack.com',
+                    'path': '/'
+                }])
             
             page = await context.new_page()
             
+            # Navigate to Substack Chat
+            # You may need to adjust this URL to your specific chat
+            await page.goto('https://substack.com/chat', wait_until='domcontentloaded', timeout=15000)
+            
+            # Try multiple selectors for the chat input
+            input_selectors = [
+                '[data-testid="chat-input"]',
+                '.chat-input',
+                'textarea[placeholder*="message"]',
+                'div[contenteditable="true"]',
+                '.ProseMirror',
+                'textarea'
+            ]
+            
+            # One locator over all candidates shares a single wait budget instead of one per selector
             try:
-                # Navigate to Substack Chat
-                # You may need to adjust this URL to your specific chat
-                await page.goto('https://substack.com/chat', wait_until='networkidle')
-                
-                # Wait for the page to load and check if authenticated
-                await page.wait_for_timeout(3000)
-                
-                # Try multiple selectors for the chat input
-                input_selectors = [
-                    '[data-testid="chat-input"]',
-                    '.chat-input',
-                    'textarea[placeholder*="message"]',
-                    'div[contenteditable="true"]',
-                    '.ProseMirror',
-                    'textarea'
-                ]
-                
-                message_input = None
-                for selector in input_selectors:
-                    try:
-                        message_input = await page.wait_for_selector(selector, timeout=3000)
-                        if message_input:
-                            break
-                    except:
-                        continue
-                
-                if not message_input:
-                    raise Exception("Could not find chat input field")
-                
-                # Click and fill the message
-                await message_input.click()
-                await message_input.fill(message)
-                
-                # Send the message
-                send_selectors = [
-                    '[data-testid="send-button"]',
-                    'button[type="submit"]',
-                    '.send-button',
-                    'button[aria-label*="Send"]'
-                ]
-                
-                sent = False
-                for selector in send_selectors:
-                    try:
-                        send_button = await page.query_selector(selector)
-                        if send_button:
-                            await send_button.click()
-                            sent = True
-                            break
-                    except:
-                        continue
-                
-                if not sent:
-                    # Fallback: try pressing Enter
-                    await page.keyboard.press('Enter')
-                
-                logger.info("Message posted to Substack Chat successfully")
-                await page.wait_for_timeout(2000)
-                
-            except Exception as e:
-                logger.error(f"Error posting to Substack Chat: {e}")
-                raise
-            finally:
-                await browser.close()
+                await page.locator(f"{', '.join(input_selectors)} >> visible=true").first.wait_for(timeout=10000)
+            except PlaywrightTimeoutError:
+                if use_saved_state:
+                    return False
+                raise Exception("Could not find chat input field")
+            
+            # Then pick by listed priority, so a search or comment box earlier in the DOM can't win
+            message_input = await self._first_visible(page, input_selectors)
+            if not message_input:
+                raise Exception("Could not find chat input field")
+            
+            # Resolve the element once so the post-send wait watches the same node we typed into
+            input_handle = await message_input.element_handle()
+            
+            # Click and fill the message
+            await input_handle.click()
+            await input_handle.fill(message)
+            
+            # Send the message
+            send_selectors = [
+                '[data-testid="send-button"]',
+                'button[type="submit"]',
+                '.send-button',
+                'button[aria-label*="Send"]'
+            ]
+            
+            send_button = await self._first_visible(page, send_selectors)
+            sent = False
+            if send_button:
+                try:
+                    await send_button.click(timeout=3000)
+                    sent = True
+                except PlaywrightTimeoutError:
+                    logger.warning("Send button was not clickable, pressing Enter instead")
+            
+            if not sent:
+                # Fallback: try pressing Enter
+                await page.keyboard.press('Enter')
+            
+            # The chat clears its input once the message is sent; wait for that instead of sleeping
+            try:
+                await page.wait_for_function(
+                    "el => !(el.value ?? el.innerText).trim()",
+                    arg=input_handle,
+                    timeout=5000
+                )
+            except PlaywrightTimeoutError:
+                logger.warning("Chat input did not clear after sending")
+            logger.info("Message posted to Substack Chat successfully")
+            
+            await self._save_state(context)
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error posting to Substack Chat: {e}")
+            raise
+        finally:
+            await context.close()
+    
+    async def _first_visible(self, page, selectors):
+        """
+        Return a locator for the first selector, in listed order, that currently has a visible match
+        """
+        for selector in selectors:
+            locator = page.locator(f"{selector} >> visible=true")
+            if await locator.count():
+                return locator.first
+        return None
+    
+    async def _save_state(self, context):
+        """
+        Persist the authenticated session so the next run can skip cookie login
+        Written to a private temp file and swapped in atomically; failures only log, since the post already went out
+        """
+        tmp_path = STATE_PATH.with_name(STATE_PATH.name + '.tmp')
+        try:
+            state = await context.storage_state()
+            # The state holds the session cookie, so create the file owner-only from the start
+            STATE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path.unlink(missing_ok=True)
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump({'cookie_sha256': self._cookie_hash(), 'storage_state': state}, f)
+            os.replace(tmp_path, STATE_PATH)
+        except Exception as e:
+            logger.warning(f"Could not save Substack session state: {e}")
+            tmp_path.unlink(missing_ok=True)
     
     def format_market_analysis(self, es_data, nq_data):
         """
@@ -242,35 +521,23 @@ class SubstackBot:
         """
         timestamp = datetime.now(timezone.utc).strftime('%H:%M UTC')
         
-        message = f"📊 Market Update - {timestamp}\n\n"
+        parts = [f"📊 Market Update - {timestamp}", ""]
         
-        if es_data and es_data['close']:
-            message += f"🔹 ES (S&P 500 Futures)\n"
-            message += f"Current/Last: {es_data['close']:.2f}\n"
-            if es_data['high']:
-                message += f"Resistance: {es_data['high']:.2f} (High)\n"
-            if es_data['low']:
-                message += f"Support: {es_data['low']:.2f} (Low)\n"
-            if es_data['open']:
-                message += f"Open: {es_data['open']:.2f}\n"
-            message += "\n"
+        for label, data in (("ES (S&P 500 Futures)", es_data), ("NQ (Nasdaq Futures)", nq_data)):
+            if not (data and data.get('close')):
+                continue
+            parts.append(f"🔹 {label}")
+            parts.append(f"Current/Last: {data['close']:.2f}")
+            for tag, key, suffix in (("Resistance", 'high', " (High)"), ("Support", 'low', " (Low)"), ("Open", 'open', "")):
+                if data.get(key):
+                    parts.append(f"{tag}: {data[key]:.2f}{suffix}")
+            parts.append("")
         
-        if nq_data and nq_data['close']:
-            message += f"🔹 NQ (Nasdaq Futures)\n"
-            message += f"Current/Last: {nq_data['close']:.2f}\n"
-            if nq_data['high']:
-                message += f"Resistance: {nq_data['high']:.2f} (High)\n"
-            if nq_data['low']:
-                message += f"Support: {nq_data['low']:.2f} (Low)\n"
-            if nq_data['open']:
-                message += f"Open: {nq_data['open']:.2f}\n"
-            message += "\n"
+        parts.append("⚡ Key levels extracted from TradingView OHLC data")
+        parts.append("📈 Support = Low | Resistance = High | Current = Close")
+        parts.append("#Trading #Futures #ES #NQ #TradingView")
         
-        message += "⚡ Key levels extracted from TradingView OHLC data\n"
-        message += "📈 Support = Low | Resistance = High | Current = Close\n"
-        message += "#Trading #Futures #ES #NQ #TradingView"
-        
-        return message
+        return "\n".join(parts)
     
     async def run_analysis(self):
         """
@@ -279,26 +546,41 @@ class SubstackBot:
         try:
             logger.info("Starting OHLC market analysis...")
             
-            # Extract OHLC data from TradingView
-            es_task = self.extract_ohlc_data('ES1!')
-            nq_task = self.extract_ohlc_data('NQ1!')
-            
-            es_data, nq_data = await asyncio.gather(es_task, nq_task)
-            
-            if not es_data and not nq_data:
-                logger.error("Failed to extract any OHLC data")
-                return
-            
-            logger.info(f"ES Data: {es_data}")
-            logger.info(f"NQ Data: {nq_data}")
-            
-            # Format the message
-            message = self.format_market_analysis(es_data, nq_data)
-            logger.info(f"Formatted message: {message[:150]}...")
-            
-            # Post to Substack Chat
-            await self.post_to_substack_chat(message)
-            logger.info("OHLC analysis complete and posted!")
+            async with self._lifecycle():
+                # Extract OHLC data from TradingView
+                es_task = self.extract_ohlc_data('ES1!')
+                nq_task = self.extract_ohlc_data('NQ1!')
+                
+                es_data, nq_data = await asyncio.gather(es_task, nq_task)
+                
+                if not es_data and not nq_data:
+                    logger.error("Failed to extract any OHLC data")
+                    return
+                
+                logger.info(f"ES Data: {es_data}")
+                logger.info(f"NQ Data: {nq_data}")
+                
+                # Skip posting if the levels haven't moved; on the scanner path this also avoids launching Chromium
+                rounded = [
+                    round((data or {}).get(field) or 0, 2)
+                    for data in (es_data, nq_data)
+                    for field in ('open', 'high', 'low', 'close')
+                ]
+                post_key = hashlib.sha1(json.dumps(rounded).encode()).hexdigest()
+                if LAST_POST_PATH.exists() and LAST_POST_PATH.read_text().strip() == post_key:
+                    logger.info("No change in OHLC data since last post, skipping post")
+                    return
+                
+                # Format the message
+                message = self.format_market_analysis(es_data, nq_data)
+                logger.info(f"Formatted message: {message[:150]}...")
+                
+                # Post to Substack Chat
+                browser = await self._get_browser()
+                await self.post_to_substack_chat(message, browser)
+                STATE_DIR.mkdir(parents=True, exist_ok=True)
+                LAST_POST_PATH.write_text(post_key)
+                logger.info("OHLC analysis complete and posted!")
             
         except Exception as e:
             logger.error(f"Error in analysis workflow: {e}")
@@ -308,8 +590,8 @@ async def main():
     """
     Entry point for the bot
     """
-    bot = SubstackBot()
-    await bot.run_analysis()
+    async with SubstackBot() as bot:
+        await bot.run_analysis()
 
 if __name__ == "__main__":
     asyncio.run(main())